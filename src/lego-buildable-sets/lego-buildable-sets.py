@@ -0,0 +1,147 @@
+import argparse
+import glob
+import numpy as np
+import os
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.common_functions import build_inventory_vector
+from utils.common_functions import load_ignore_strings
+from utils.common_functions import load_profile_inventory
+from utils.common_functions import user_data_dir
+from utils.output_formats import find_output_file
+from utils.output_formats import read_output_file
+from utils.part_lookups import lookup_color_id
+from utils.part_lookups import normalize_design_id
+
+# File paths for configuration and output (the cached part lists are read from the user data directory)
+
+config_file = '../lego-pick-list/config.json'
+output_file = os.path.join(user_data_dir, 'buildable_sets.csv')
+
+# Function to read every cached part list into one long (set, design, color, quantity) table
+
+def read_cached_part_lists():
+
+    # Each set's part list lives in its own subdirectory, in any of the tabular output formats
+    set_dirs = sorted(path for path in glob.glob(os.path.join(user_data_dir, '*')) if os.path.isdir(path))
+    part_list_files = [find_output_file(os.path.join(set_dir, f"{os.path.basename(set_dir)}_part_list")) for set_dir in set_dirs]
+    part_list_files = [path for path in part_list_files if path is not None]
+    if not part_list_files:
+        print(f"Error: No cached part lists found in '{user_data_dir}'.")
+        print("Run the LEGO Part List Extractor script for the sets you want to score first.")
+        sys.exit(1)
+
+    frames = []
+    for part_list_file in part_list_files:
+        set_number = os.path.basename(part_list_file).rsplit('_part_list', 1)[0]
+
+        # An empty, truncated or otherwise unreadable part list is skipped instead of stopping the whole ranking
+        try:
+            df_parts = read_output_file(part_list_file, usecols=['Design ID', 'Color', 'Quantity'], dtype={'Design ID': str, 'Color': str})
+            df_parts = df_parts[['Design ID', 'Color', 'Quantity']].astype({'Design ID': str, 'Color': str})
+        except Exception as e:
+            print(f"Warning: Skipping unreadable part list {part_list_file}: {e}")
+            continue
+
+        df_parts['Set Number'] = set_number
+        frames.append(df_parts)
+
+    if not frames:
+        print(f"Error: None of the cached part lists in '{user_data_dir}' could be read.")
+        sys.exit(1)
+
+    print(f"Loaded {len(frames)} of {len(part_list_files)} cached part lists.")
+
+    return pd.concat(frames, ignore_index=True)
+
+# Function to build the requirement matrix in sparse (COO) form: one entry per set and (design, color) key
+
+def build_requirements(part_lists):
+
+    # Translate color names into the numeric color codes used by the inventory; unmapped names never match
+    color_ids = part_lists['Color'].map(lookup_color_id).fillna('name:' + part_lists['Color'].astype(str))
+
+    requirements = pd.DataFrame({
+        'set_number': part_lists['Set Number'],
+        'key': part_lists['Design ID'].map(normalize_design_id) + '|' + color_ids,
+        'quantity': pd.to_numeric(part_lists['Quantity'], errors='coerce').fillna(0).astype(np.int64)
+    })
+
+    # Collapse duplicate (set, design, color) rows into a single requirement
+    return requirements.groupby(['set_number', 'key'], as_index=False, sort=False)['quantity'].sum()
+
+# Function to score every set against the inventory in a single vectorized pass
+
+def score_sets(requirements, inventory_vector):
+
+    # Row index (set) and column lookup (design, color) for each non-zero requirement entry
+    set_codes, set_numbers = pd.factorize(requirements['set_number'])
+    required = requirements['quantity'].to_numpy()
+    available = inventory_vector.reindex(requirements['key']).fillna(0).to_numpy(dtype=np.int64)
+
+    # Each requirement is covered up to the quantity on hand
+    covered = np.minimum(required, available)
+
+    num_sets = len(set_numbers)
+    parts_required = np.bincount(set_codes, weights=required, minlength=num_sets)
+    parts_covered = np.bincount(set_codes, weights=covered, minlength=num_sets)
+    lots_total = np.bincount(set_codes, minlength=num_sets)
+    lots_complete = np.bincount(set_codes, weights=(covered >= required), minlength=num_sets)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = np.where(parts_required > 0, parts_covered / parts_required * 100, 0.0)
+
+    scores = pd.DataFrame({
+        'Set Number': set_numbers,
+        'Coverage %': np.round(coverage, 1),
+        'Parts Covered': parts_covered.astype(np.int64),
+        'Parts Required': parts_required.astype(np.int64),
+        'Parts Missing': (parts_required - parts_covered).astype(np.int64),
+        'Lots Complete': lots_complete.astype(np.int64),
+        'Lots Total': lots_total
+    })
+
+    # Rank by coverage, then by the fewest missing parts
+    return scores.sort_values(['Coverage %', 'Parts Missing'], ascending=[False, True]).reset_index(drop=True)
+
+# Function to print the top-ranked sets
+
+def print_scores(scores, top):
+    print(scores.head(top).to_string(index=False))
+
+# Main function
+
+def main(top, min_coverage, profiles):
+
+    # Read the cached part lists and the user's inventory (or the union of the profiles' inventories)
+    part_lists = read_cached_part_lists()
+    ignore_strings = load_ignore_strings(config_file)
+    inventory = [item for profile in (profiles or [None]) for item in load_profile_inventory(profile, ignore_strings)]
+
+    # Build the requirement matrix and inventory vector, and score every set
+    requirements = build_requirements(part_lists)
+    inventory_vector = build_inventory_vector(inventory)
+    scores = score_sets(requirements, inventory_vector)
+    scores = scores[scores['Coverage %'] >= min_coverage]
+
+    # Save the ranking to a CSV file
+    scores.to_csv(output_file, index=False)
+
+    print_scores(scores, top)
+    print(f"Buildability scores for {len(scores)} sets saved to {output_file}")
+
+# Entry point
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank cached LEGO sets by how much of each part list your inventory covers.")
+    parser.add_argument("--top", type=int, default=25, help="number of ranked sets to print (default: 25)")
+    parser.add_argument("--min-coverage", type=float, default=0.0, help="only keep sets with at least this coverage percentage")
+    parser.add_argument("--profile", dest="profiles", action="append", metavar="PROFILE", help="score against the inventory of this profile in data/user_data/profiles (repeat to score against the union of several profiles)")
+    args = parser.parse_args()
+
+    main(args.top, args.min_coverage, args.profiles)
@@ -1,4 +1,5 @@
-import csv
+import argparse
+import asyncio
 import os 
 import re
 import sys
@@ -14,21 +15,33 @@ from selenium.webdriver.support import expected_conditions as EC
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 # Import common functions from utils
+from utils.common_functions import DEFAULT_RATE_LIMIT
 from utils.common_functions import init_webdriver
 from utils.common_functions import load_instabrick_environment
 from utils.common_functions import login_instabrick
 from utils.common_functions import navigate_to_sets_page
 from utils.common_functions import normalize_set_number
 from utils.common_functions import search_for_set
+from utils.common_functions import set_rate_limit
+from utils.common_functions import throttle
+from utils.common_functions import user_data_dir
+from utils.output_formats import TABULAR_FORMATS
+from utils.output_formats import check_output_format
+from utils.output_formats import output_path
+from utils.output_formats import write_rows
+from utils.part_lookups import lookup_color_id
+from utils.retry_policy import with_retry
+from utils.scrape_pipeline import run_pipeline
 
-# Function to get the page source for the part list
+# Function to yield the page source of each page of the part list
 
-def get_part_list_page(driver, first_matching_row):
+def iter_part_list_pages(driver, first_matching_row):
 
     # Go to the first row of the Sets table and find the Set Info button
     set_info_button = first_matching_row.find_element(By.CSS_SELECTOR, "td .table_button_show_set")
 
     # Click the Set Info button
+    throttle()
     set_info_button.click()
 
     # Locate the "Showing 1 to 25 of n entries" text
@@ -67,6 +80,7 @@ def get_part_list_page(driver, first_matching_row):
         select.select_by_visible_text("100")
         
         # Trigger the change event
+        throttle()
         driver.execute_script("arguments[0].dispatchEvent(new Event('change'))", entries_dropdown)
 
         # Wait for the "Showing 1 to 25 of n entries" text to update to show the correct range
@@ -76,11 +90,9 @@ def get_part_list_page(driver, first_matching_row):
         )
 
     # Pagination handling for the parts list page
-    combined_page_source = ""
-
     while True:
-        # Append the current page's source
-        combined_page_source += driver.page_source
+        # Hand back the current page's source
+        yield driver.page_source
 
         # Check if the "Next" button is available and enabled
         try:
@@ -92,6 +104,7 @@ def get_part_list_page(driver, first_matching_row):
             current_info_text = driver.find_element(By.CSS_SELECTOR, ".dataTables_info").text
 
             # Click the "Next" button
+            throttle()
             next_button.click()
 
             # Wait for the table to update to the next range of entries
@@ -103,8 +116,6 @@ def get_part_list_page(driver, first_matching_row):
             # Exit the loop if the "Next" button is not found
             break
 
-    return combined_page_source
-
 # Function to scrape the parts list from the page source
 
 def scrape_part_list(page_source):
@@ -116,84 +127,153 @@ def scrape_part_list(page_source):
     part_list_rows = soup.select("#set_parts_list tr")
     for row in part_list_rows:
         cells = row.find_all("td")
-        if len(cells) < 5:  # Skip invalid rows
+        if len(cells) < 7:  # Skip invalid rows
             continue
         part_id = cells[0].text.strip()
         part_name = cells[1].text.strip()
         design_id = cells[2].text.strip()
         color = cells[3].text.strip()
+        color_id = lookup_color_id(color)
+        color_id = None if color_id is None else int(color_id)  # Numeric color code, or None for unknown colors
         type = cells[4].text.strip()
-        quantity = cells[6].text.strip()
-        parts.append({"Part ID": part_id, "Part Name": part_name, "Design ID": design_id, "Color": color, "Type": type, "Qty": quantity})
+
+        # Skip rows whose quantity is not a number, instead of losing the rest of the page
+        try:
+            quantity = int(cells[6].text.strip().replace(",", ""))
+        except ValueError:
+            print(f"Skipping part {part_id} ({design_id}, {color}): quantity '{cells[6].text.strip()}' is not a number")
+            continue
+
+        parts.append({"Part ID": part_id, "Part Name": part_name, "Design ID": design_id, "Color": color, "Color ID": color_id, "Type": type, "Quantity": quantity})
 
     return parts
 
-# Function to save the part list to a CSV file
+# Function to save the part list to a file in the chosen output format
 
-def write_part_list_to_csv(part_list, set_number):
+def write_part_list(part_list, set_number, output_format):
 
     # Create subdirectory for part list if it doesn't exist
-    output_dir = f"../../data/user_data/{set_number}"
+    output_dir = os.path.join(user_data_dir, set_number)
     os.makedirs(output_dir, exist_ok=True)  # Create the subdirectory if it doesn't exist
 
-    # Output CSV file path using the set number in the file name
-    csv_file_name = f"{set_number}_part_list.csv"
-    csv_file_path = os.path.join(output_dir, csv_file_name)
-
-    # CSV headers
-    headers = ["Part ID", "Part Name", "Design ID", "Color", "Type", "Quantity"]
-
-    # Writing to CSV
-    with open(csv_file_path, mode="w", newline="", encoding="utf-8") as csv_file:
-        writer = csv.writer(csv_file, quoting=csv.QUOTE_MINIMAL)
-
-        # Write headers
-        writer.writerow(headers)
-
-        # Write data
-        for part in part_list:
-            writer.writerow([
-                part["Part ID"],   # Part ID
-                part["Part Name"], # Part Name
-                part["Design ID"], # Design ID
-                part["Color"],     # Color
-                part["Type"],      # Type
-                part["Qty"]        # Quantity
-            ]
-        )
+    # Output file path using the set number in the file name
+    output_file = output_path(os.path.join(output_dir, f"{set_number}_part_list"), output_format)
 
-    print(f"Parts list exported successfully to {csv_file_path}")
+    # Part list columns
+    headers = ["Part ID", "Part Name", "Design ID", "Color", "Color ID", "Type", "Quantity"]
 
-# Main function
+    # Stream the parts to the file
+    write_rows(part_list, output_file, headers, output_format)
 
-def main(set_number):
+    print(f"Parts list exported successfully to {output_file}")
 
-    # Normalize the set number
-    normalized_set_number = normalize_set_number(set_number)
-        
-    # Get Instabrick credentials and initialize the WebDriver
-    username, password = load_instabrick_environment()
-    driver = init_webdriver()
+# Function to fetch the part list pages for a set and hand each one to the pipeline
 
-    # Log into Instabrick and get the part list for the specified set
-    try:
-        # Log into Instabrick
-        login_instabrick(driver, username, password)
+def fetch_part_list_pages(driver, set_number, emit, credentials):
+
+    # Pages already handed to the pipeline are kept if a later page fails; the retry skips them
+    emitted_pages = 0
+
+    def fetch():
+        nonlocal emitted_pages
 
         # Navigate to the Sets page
         navigate_to_sets_page(driver)
 
         # Search for the set on the Sets page and return the first row
-        first_matching_row = search_for_set(driver, normalized_set_number)
-    
-        # Get the page source for the part list
-        page_source = get_part_list_page(driver, first_matching_row)
+        first_matching_row = search_for_set(driver, set_number)
+        if first_matching_row is None:
+            raise LookupError(f"set {set_number} was not found on the Sets page")
+
+        # Emit each page as soon as it has loaded, followed by a marker with the page count
+        for page_number, page_source in enumerate(iter_part_list_pages(driver, first_matching_row)):
+            if page_number < emitted_pages:
+                continue
+            emit((set_number, page_number, page_source))
+            emitted_pages += 1
+
+        emit((set_number, emitted_pages, None))
 
-        # Get the part list from the page source
-        part_list = scrape_part_list(page_source)
+    with_retry(driver, fetch, f"fetch the part list for set {set_number}", credentials)
 
-        # Save the part list to a CSV file
-        write_part_list_to_csv(part_list, normalized_set_number)
+# Function to parse one fetched part list page (or pass through the end-of-set marker)
+
+def parse_part_list_page(page):
+    set_number, page_number, page_source = page
+    if page_source is None:
+        return set_number, page_number, None
+    return set_number, page_number, scrape_part_list(page_source)
+
+# Functions to validate numeric command line options
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+# Main function
+
+def main(set_numbers, output_format, rate, queue_size, parse_workers, profile):
+
+    # Check the output format can be written before anything is downloaded
+    check_output_format(output_format)
+
+    # Normalize the set numbers
+    normalized_set_numbers = [normalize_set_number(set_number) for set_number in set_numbers]
+
+    # Throttle requests to the Instabrick website
+    set_rate_limit(rate)
+
+    # Get Instabrick credentials and initialize the WebDriver
+    username, password = load_instabrick_environment(profile)
+    driver = init_webdriver()
+
+    # Parsed pages per set, and the page count once all of a set's pages have been fetched
+    parsed_pages = {}
+    page_counts = {}
+
+    # Save a set's part list once every one of its pages has been parsed
+    def write_parsed_page(parsed):
+        set_number, page_number, parts = parsed
+        if parts is None:
+            page_counts[set_number] = page_number
+        else:
+            parsed_pages.setdefault(set_number, {})[page_number] = parts
+
+        pages = parsed_pages.get(set_number, {})
+        if set_number in page_counts and len(pages) == page_counts[set_number]:
+            part_list = (part for page_number in sorted(pages) for part in pages[page_number])
+            write_part_list(part_list, set_number, output_format)
+            parsed_pages.pop(set_number, None)
+
+    # Log into Instabrick and get the part list for the specified sets
+    try:
+        # Log into Instabrick
+        login_instabrick(driver, username, password)
+
+        # Fetch, parse and save the part lists, parsing fetched pages while the next page loads
+        metrics = asyncio.run(run_pipeline(
+            normalized_set_numbers,
+            lambda set_number, emit: fetch_part_list_pages(driver, set_number, emit, (username, password)),
+            parse_part_list_page,
+            write_parsed_page,
+            queue_size=queue_size,
+            parse_workers=parse_workers,
+            item_of=lambda page: page[0],  # Pages and parsed pages both start with the set number
+            is_marker=lambda page: page[2] is None  # The end-of-set marker carries no page
+        ))
+        metrics.report()
+
+        # List the sets that still failed after retrying, so they can be rerun on their own
+        if metrics.failed_items:
+            print(f"Part lists could not be downloaded for: {' '.join(metrics.failed_items)}")
 
     finally:
         driver.quit()
@@ -201,9 +281,13 @@ def main(set_number):
 # Entry point
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python lego-part-list.py <set_number>")
-        sys.exit(1)
-
-    set_number = sys.argv[1]
-    main(set_number)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download the part list for one or more LEGO sets from the Instabrick website.")
+    parser.add_argument("set_numbers", nargs="+", metavar="set_number", help="set number(s), e.g. 10783 or 10783-1")
+    parser.add_argument("--format", choices=TABULAR_FORMATS, default="csv", help="output file format (default: csv)")
+    parser.add_argument("--rate", type=positive_float, default=DEFAULT_RATE_LIMIT, help=f"maximum requests per second to the Instabrick website (default: {DEFAULT_RATE_LIMIT:g})")
+    parser.add_argument("--queue-size", type=positive_int, default=4, help="maximum pages waiting between pipeline stages (default: 4)")
+    parser.add_argument("--parse-workers", type=positive_int, default=2, help="number of concurrent page parsers (default: 2)")
+    parser.add_argument("--profile", help="use the Instabrick credentials of this profile in data/user_data/profiles")
+    args = parser.parse_args()
+
+    main(args.set_numbers, args.format, args.rate, args.queue_size, args.parse_workers, args.profile)
@@ -1,167 +1,216 @@
-import json
+import argparse
 import os
 import pandas as pd
 import sys
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
 # Add the src directory to the Python path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from utils.common_functions import build_inventory_vector
+from utils.common_functions import get_profile_dir
+from utils.common_functions import load_ignore_strings
+from utils.common_functions import load_profile_inventory
 from utils.common_functions import normalize_set_number
-
-# File paths for color mapping and user's inventory
-
-color_mapping_file = '../../data/instabrick_colors.csv'
-inventory_file = '../../data/user_data/inventory.xml'
+from utils.common_functions import user_data_dir
+from utils.output_formats import FILE_EXTENSIONS
+from utils.output_formats import check_output_format
+from utils.output_formats import find_output_file
+from utils.output_formats import output_path
+from utils.output_formats import read_output_file
+from utils.output_formats import write_rows
+from utils.part_lookups import lookup_color_id
+from utils.part_lookups import lookup_color_name
+from utils.part_lookups import normalize_design_id
+
+# File path for configuration
+
+config_file = 'config.json'
     
-# Function to read the color mapping
-
-def read_color_mapping():
-    df_colors = pd.read_csv(color_mapping_file)
-    df_colors['color'] = df_colors['color'].astype(str)
-    return df_colors
-
-# Function to read the required parts and map color names
+# Function to read the required parts and map color names to color codes
 
 def read_required_parts(part_list_file):
-    try:
-        df_parts = pd.read_csv(part_list_file)
-    except FileNotFoundError:
-        print(f"Error: The required file '{part_list_file}' is missing. Please ensure the file exists and try again.")
-        raise  # Re-raise the exception after logging the message to terminate the program
-        
-    df_colors = read_color_mapping()
-
-    # Merge the part list with the color mapping on the 'Color' column
-    required_parts = pd.merge(df_parts, df_colors, left_on='Color', right_on='name', how='left')
-    required_parts = required_parts[['Design ID', 'Part ID', 'Color', 'name', 'Quantity', 'Part Name']].rename(columns={'name': 'Color Name'})
-
-    return required_parts
-
-# Function to parse the inventory XML
 
-def parse_inventory():
+    # The part list may have been saved in any of the tabular output formats
+    part_list_path = find_output_file(part_list_file)
+    if part_list_path is None:
+        print(f"Error: The required file '{part_list_file}.csv' is missing. Please ensure the file exists and try again.")
+        raise FileNotFoundError(part_list_file)  # Terminate the program after logging the message
 
-    tree = ET.parse(inventory_file)
-    root = tree.getroot()
+    df_parts = read_output_file(part_list_path, dtype={'Design ID': str})
 
-    inventory = []
+    required_parts = df_parts[['Design ID', 'Part ID', 'Color', 'Quantity', 'Part Name']].copy()
 
-    # Load strings to ignore from (optional) configuration file
-    try:
-        with open('config.json', 'r') as config_file:
-            config = json.load(config_file)
-    except FileNotFoundError:
-        config = {}
+    # Map color names to color codes; part lists saved with a Color ID column use it first
+    color_ids = df_parts['Color'].map(lookup_color_id)
+    if 'Color ID' in df_parts:
+        color_ids = df_parts['Color ID'].map(lookup_color_id).fillna(color_ids)
 
-    ignore_strings = config.get('ignore_strings', [])
+    required_parts['Color ID'] = color_ids
+    required_parts['Color Name'] = color_ids.map(lookup_color_name).fillna(required_parts['Color'])
 
-    # Build the inventory data structure
-    for item in root.findall('ITEM'):
-        design_id = item.find('ITEMID').text
-        color = item.find('COLOR').text
-        quantity = int(item.find('QTY').text)
-        location = item.find('REMARKS').text
+    return required_parts
 
-        # Ignore locations matching the strings to ignore
-        if any(ignore in location for ignore in ignore_strings):
-            continue
+# Function to index the inventory by (design, color), plus by design alone for parts whose color is unknown
 
-        # Remove the [IB] text from the location for readability
-        if location.startswith('[IB]') and location.endswith('[IB]'):
-            location = location[4:-4].strip()
+def index_inventory(inventory):
+    locations = {}
 
-        inventory.append({
-            'design_id': design_id,
-            'color': color,
-            'quantity': quantity,
-            'location': location
-        })
+    # The first location found for each key is used
+    for item in inventory:
+        design_id = normalize_design_id(item['design_id'])
+        locations.setdefault((design_id, lookup_color_id(item['color'])), item['location'])
+        locations.setdefault((design_id, None), item['location'])
 
-    return inventory
+    return locations
 
 # Function to create the pick list
 
 def create_pick_list(required_parts, inventory):
     pick_list = []
+    locations = index_inventory(inventory)
+    quantities_on_hand = build_inventory_vector(inventory)
 
     for _, part in required_parts.iterrows():
-        part_found = False
-
         design_id = str(part['Design ID'])
-        part_id = str(part['Part ID'])
-        color = str(part['Color'])
+        color_id = None if pd.isna(part['Color ID']) else part['Color ID']  # Color code for matching and the BrickLink wanted list
         color_name = part['Color Name'] # Color name for output
         quantity_needed = part['Quantity']
         description = part['Part Name']
 
-        for item in inventory:
-            if item['design_id'] == design_id:
-                pick_list.append({
-                    'Location': item['location'],
-                    'Design ID': design_id,
-                    'Description': description,
-                    'Color': color_name,
-                    'Quantity Needed': quantity_needed
-                })
-
-                # Mark that the part was found
-                part_found = True
-
-                break
-
-        # If the part was not found, add a "Location Unknown" row
-        if not part_found:
-            pick_list.append({
-                'Location': '(Location unknown)',
-                'Design ID': design_id,
-                'Description': description,
-                'Color': color_name,
-                'Quantity Needed': quantity_needed
-            })
+        # Quantity on hand of the same design and color (parts whose color is unknown never match)
+        quantity_on_hand = 0 if color_id is None else int(quantities_on_hand.get(f"{normalize_design_id(design_id)}|{color_id}", 0))
+
+        # Match on the normalized design and color (the design ID is written as scraped); if the part is not found, add a "Location Unknown" row
+        pick_list.append({
+            'Location': locations.get((normalize_design_id(design_id), color_id), '(Location unknown)'),
+            'Design ID': design_id,
+            'Description': description,
+            'Color': color_name,
+            'Color ID': color_id,
+            'Quantity Needed': quantity_needed,
+            'Quantity On Hand': quantity_on_hand
+        })
 
     # Sort the pick list by Location, then Design ID
     pick_list = sorted(pick_list, key=lambda x: (x['Location'], x['Design ID']))
     
     return pick_list
 
-# Function to save the pick list to an Excel file
+# Function to list the parts missing from the inventory: the quantity needed beyond the quantity on hand, per (design, color)
+
+def find_missing_parts(pick_list):
+    missing_parts = {}
+
+    # Rows for the same design and color are added up before the quantity on hand is taken off
+    for part in pick_list:
+        key = (normalize_design_id(part['Design ID']), part['Color ID'])
+        missing_part = missing_parts.setdefault(key, {'Design ID': part['Design ID'], 'Color ID': part['Color ID'], 'Quantity': -part['Quantity On Hand']})
+        missing_part['Quantity'] += int(part['Quantity Needed'])
+
+    return [part for part in missing_parts.values() if part['Quantity'] > 0]
+
+# Function to save the pick list to a file in the chosen output format
+
+def save_pick_list(pick_list, output_file, output_format):
 
-def save_pick_list(pick_list, output_file):
-    df = pd.DataFrame(pick_list)
-    df.to_csv(output_file, index=False)
+    # The BrickLink wanted list only contains the parts missing from the inventory
+    if output_format == 'bricklink':
+        return write_rows(find_missing_parts(pick_list), output_file, [], output_format)
+
+    headers = ['Location', 'Design ID', 'Description', 'Color', 'Quantity Needed']
+    return write_rows(pick_list, output_file, headers, output_format)
+
+# Function to build a pick list file path for a set in a data directory
+
+def pick_list_path(data_dir, set_number, output_format, suffix=''):
+    output_name = 'wanted_list' if output_format == 'bricklink' else 'pick_list'
+    subdirectory = os.path.join(data_dir, set_number)
+    os.makedirs(subdirectory, exist_ok=True)
+    return output_path(os.path.join(subdirectory, f'{set_number}_{output_name}{suffix}'), output_format)
+
+# Function to create and save the pick list for one profile's inventory (run in a worker process)
+
+def create_profile_pick_list(profile, required_parts, ignore_strings, set_number, output_format):
+
+    inventory = load_profile_inventory(profile, ignore_strings)
+    pick_list = create_pick_list(required_parts, inventory)
+
+    output_file = pick_list_path(get_profile_dir(profile), set_number, output_format)
+    rows_written = save_pick_list(pick_list, output_file, output_format)
+
+    return output_file, rows_written
+
+# Function to combine several profiles' inventories, labelling each location with its profile
+
+def combine_inventories(profiles, inventories):
+    return [
+        {**item, 'location': f"{profile}: {item['location']}"}
+        for profile, inventory in zip(profiles, inventories)
+        for item in inventory
+    ]
 
 # Main function
 
-def main(set_number):
+def main(set_number, output_format, profiles, union):
+
+    # Check the output format can be written before any inventory is loaded
+    check_output_format(output_format)
 
     # Normalize the set number
     normalized_set_number = normalize_set_number(set_number)
         
-    # Define part list and output paths based on the set number
-    subdirectory = f'../../data/user_data/{normalized_set_number}'
-    part_list_file = os.path.join(subdirectory, f'{normalized_set_number}_part_list.csv')
-    output_file = os.path.join(subdirectory, f'{normalized_set_number}_pick_list.csv')
+    # Define the part list path based on the set number
+    subdirectory = os.path.join(user_data_dir, normalized_set_number)
+    part_list_file = os.path.join(subdirectory, f'{normalized_set_number}_part_list')
 
-    # Read required parts and parse the inventory
+    # Read required parts and the strings to ignore
     required_parts = read_required_parts(part_list_file)
-    inventory = parse_inventory()
-
-    # Create the pick list
-    pick_list = create_pick_list(required_parts, inventory)
-
-    # Save the pick list to an Excel file
-    save_pick_list(pick_list, output_file)
-
-    print(f"Pick list saved to {output_file}")
+    ignore_strings = load_ignore_strings(config_file)
+
+    # Single-user mode: the inventory in the user data directory
+    if not profiles:
+        output_file, rows_written = create_profile_pick_list(None, required_parts, ignore_strings, normalized_set_number, output_format)
+        print(f"Pick list saved to {output_file} ({rows_written} rows)")
+        return
+
+    with ProcessPoolExecutor(max_workers=min(len(profiles), os.cpu_count() or 1)) as executor:
+
+        # Union mode: load the profiles' inventories in parallel and build one pick list across all of them
+        if union:
+            inventories = list(executor.map(load_profile_inventory, profiles, repeat(ignore_strings)))
+            pick_list = create_pick_list(required_parts, combine_inventories(profiles, inventories))
+
+            output_file = pick_list_path(get_profile_dir(), normalized_set_number, output_format, '_' + '_'.join(profiles))
+            rows_written = save_pick_list(pick_list, output_file, output_format)
+            print(f"Pick list saved to {output_file} ({rows_written} rows)")
+            return
+
+        # Per-profile mode: build each profile's pick list in its own worker process
+        results = executor.map(
+            create_profile_pick_list,
+            profiles,
+            repeat(required_parts),
+            repeat(ignore_strings),
+            repeat(normalized_set_number),
+            repeat(output_format)
+        )
+        for profile, (output_file, rows_written) in zip(profiles, results):
+            print(f"Pick list for profile '{profile}' saved to {output_file} ({rows_written} rows)")
 
 # Entry point
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python3 lego-pick-list.py <set_number>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Generate a pick list for a LEGO set from your Instabrick inventory.")
+    parser.add_argument("set_number", help="set number, e.g. 10783 or 10783-1")
+    parser.add_argument("--format", choices=list(FILE_EXTENSIONS), default="csv", help="output file format; 'bricklink' writes a BrickLink wanted list of the missing parts (default: csv)")
+    parser.add_argument("--profile", dest="profiles", action="append", metavar="PROFILE", help="use the inventory of this profile in data/user_data/profiles (repeat for several profiles)")
+    parser.add_argument("--union", action="store_true", help="build a single pick list across the union of the profiles' inventories")
+    args = parser.parse_args()
+
+    if args.union and not args.profiles:
+        parser.error("--union requires at least one --profile")
 
-    set_number = sys.argv[1]
-    main(set_number)
\ No newline at end of file
+    main(args.set_number, args.format, args.profiles, args.union)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import argparse
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.output_formats import TABULAR_FORMATS
+from utils.output_formats import find_output_file
+from utils.output_formats import read_output_file
+
+# Script paths (the extractor is run from its own directory, like the other scripts)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+mock_server_script = os.path.join(script_dir, "mock-instabrick-server.py")
+part_list_dir = os.path.normpath(os.path.join(script_dir, "../lego-part-list"))
+part_list_script = os.path.join(part_list_dir, "lego-part-list.py")
+
+# Function to load the mock dataset class from the mock server script (its file name is not a module name)
+
+def load_mock_dataset_class():
+    spec = importlib.util.spec_from_file_location("mock_instabrick_server", mock_server_script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.MockDataset
+
+# Function to find a free local port for the mock server
+
+def find_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Function to start the mock server and wait until it accepts connections
+
+def start_mock_server(port, latency, num_sets, parts_per_set, seed):
+
+    server = subprocess.Popen(
+        [sys.executable, mock_server_script, "--port", str(port), "--latency", str(latency),
+         "--sets", str(num_sets), "--parts", str(parts_per_set), "--seed", str(seed)],
+        stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            print("Error: The mock server exited before it started accepting connections.")
+            sys.exit(1)
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.1)
+
+    server.terminate()
+    print("Error: The mock server did not start within 30 seconds.")
+    sys.exit(1)
+
+# Function to check a saved part list against the part list generated by the mock server, returning the rows written
+
+def check_part_list(dataset, data_dir, set_number):
+
+    part_list_file = find_output_file(os.path.join(data_dir, set_number, f"{set_number}_part_list"))
+    if part_list_file is None:
+        print(f"FAIL {set_number}: no part list was written")
+        return 0
+
+    df_parts = read_output_file(part_list_file, dtype={'Design ID': str})
+    written = sorted(zip(df_parts['Design ID'].astype(str), df_parts['Color'].astype(str), df_parts['Quantity'].astype(int)))
+    expected = sorted((part['design_id'], part['color'], part['qty']) for part in dataset.generate_parts(set_number))
+
+    if len(written) != len(expected):
+        print(f"FAIL {set_number}: {len(written)} rows written, {len(expected)} expected")
+        return 0
+    if written != expected:
+        print(f"FAIL {set_number}: the rows written differ from the mock catalog")
+        return 0
+
+    return len(written)
+
+# Main function
+
+def main(num_sets, parts_per_set, latency, seed, output_format, rate):
+
+    set_numbers = [f"mock-{10000 + index}-1" for index in range(num_sets)]
+    dataset = load_mock_dataset_class()(num_sets, parts_per_set, 0, seed)
+
+    port = find_free_port()
+    server = start_mock_server(port, latency, num_sets, parts_per_set, seed)
+
+    # Run the extractor against the mock server
+    command = [sys.executable, part_list_script, *set_numbers, "--format", output_format]
+    if rate is not None:
+        command += ["--rate", str(rate)]
+
+    # The extractor writes to a temporary data directory (with placeholder credentials), never to data/user_data
+    with tempfile.TemporaryDirectory(prefix="instabrick-benchmark-") as data_dir:
+        with open(os.path.join(data_dir, ".env"), "w") as file:
+            file.write("INSTABRICK_USERNAME=benchmark@example.com\nINSTABRICK_PASSWORD=benchmark\n")
+
+        # Credentials already in the environment would take precedence over the .env file, so they are left out
+        env = {**os.environ, "INSTABRICK_BASE_URL": f"http://127.0.0.1:{port}", "INSTABRICK_DATA_DIR": data_dir}
+        env.pop("INSTABRICK_USERNAME", None)
+        env.pop("INSTABRICK_PASSWORD", None)
+
+        start_time = time.monotonic()
+        try:
+            result = subprocess.run(command, cwd=part_list_dir, env=env)
+        finally:
+            server.terminate()
+            server.wait()
+        elapsed = time.monotonic() - start_time
+
+        # Check every part list against the mock catalog
+        rows_written = sum(check_part_list(dataset, data_dir, set_number) for set_number in set_numbers)
+
+    rows_expected = num_sets * parts_per_set
+
+    print(f"\nBenchmark: {num_sets} sets, {parts_per_set} part lots each, {latency}s latency, seed {seed}, {output_format} format")
+    print(f"Rows written: {rows_written} of {rows_expected} in {elapsed:.1f}s")
+    print(f"Throughput: {rows_written / elapsed:.1f} rows/s, {num_sets / elapsed:.2f} sets/s")
+
+    if result.returncode != 0 or rows_written != rows_expected:
+        print("Benchmark FAILED.")
+        sys.exit(1)
+
+    print("Benchmark passed.")
+
+# Entry point
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the LEGO Part List Extractor against the mock server, check the part lists written and report throughput.")
+    parser.add_argument("--sets", type=int, default=5, help="number of sets to download (default: 5)")
+    parser.add_argument("--parts", type=int, default=150, help="number of part lots in each set's part list (default: 150)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds of latency added to every request (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the mock catalog (default: 1)")
+    parser.add_argument("--format", choices=TABULAR_FORMATS, default="csv", help="output file format (default: csv)")
+    parser.add_argument("--rate", type=float, help="maximum requests per second passed to the extractor (default: the extractor's default)")
+    args = parser.parse_args()
+
+    if args.sets < 1 or args.parts < 1:
+        parser.error("--sets and --parts must be at least 1")
+    if args.latency < 0:
+        parser.error("--latency must not be negative")
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be greater than 0")
+
+    main(args.sets, args.parts, args.latency, args.seed, args.format, args.rate)
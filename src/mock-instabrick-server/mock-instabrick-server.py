@@ -0,0 +1,561 @@
+import argparse
+import html
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlparse
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.part_lookups import load_color_table
+
+# Page layout shared by every page (the top menu is the scripts' login indicator)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title} - Mock Instabrick</title></head>
+<body>
+<div id="top-menu"><a href="/sets">Sets</a> | <a href="/inventory">Inventory</a></div>
+{body}
+<script>
+// Fetch JSON from the mock API, going back to the sign-in page when the session has expired
+async function api(url, options) {{
+    const response = await fetch(url, options);
+    if (response.status === 401) {{
+        window.location = '/signin';
+        throw new Error('Session expired');
+    }}
+    return response.json();
+}}
+function escapeHtml(text) {{
+    const div = document.createElement('div');
+    div.textContent = String(text);
+    return div.innerHTML;
+}}
+{script}
+</script>
+</body>
+</html>
+"""
+
+SIGNIN_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Sign in - Mock Instabrick</title></head>
+<body>
+<form method="post" action="/signin">
+    <input type="email" id="loginemail" name="email">
+    <input type="password" id="loginpassword" name="password">
+    <button type="submit" id="sign_in">Sign in</button>
+</form>
+</body>
+</html>
+"""
+
+SETS_BODY = """
+<div id="sets_list_table_filter"><label>Search: <input type="search"></label></div>
+<div id="sets_list_table_processing" style="display: block">Processing...</div>
+<table id="sets_list_table">
+    <thead><tr><th></th><th>Set</th><th>Name</th><th>Year</th><th>Theme</th><th>Parts</th><th></th></tr></thead>
+    <tbody></tbody>
+</table>
+<div id="partout_modal"></div>
+"""
+
+SETS_SCRIPT = """
+const filterInput = document.querySelector('#sets_list_table_filter input[type="search"]');
+const processing = document.getElementById('sets_list_table_processing');
+const tbody = document.querySelector('#sets_list_table tbody');
+let latestSearch = 0;
+
+function renderSetRow(set) {
+    const number = escapeHtml(set.number);
+    return `<tr><td></td><td>${number}</td><td>${escapeHtml(set.name)}</td><td>${set.year}</td>` +
+        `<td>${escapeHtml(set.theme)}</td><td>${set.num_parts}</td><td>` +
+        `<button class="table_button_show_set" data-set="${number}">Set info</button> ` +
+        `<button class="table_button_partout_inventory" data-set="${number}">Part out</button></td></tr>`;
+}
+
+// Search the sets table (server-side processing, like DataTables); stale responses are ignored
+async function searchSets(search) {
+    const searchId = ++latestSearch;
+    processing.style.display = 'block';
+    const sets = await api('/api/sets?search=' + encodeURIComponent(search));
+    if (searchId !== latestSearch) {
+        return;
+    }
+    tbody.innerHTML = sets.length
+        ? sets.map(renderSetRow).join('')
+        : '<tr><td colspan="7" class="dataTables_empty">No matching records found</td></tr>';
+    processing.style.display = 'none';
+}
+
+// Part out modal: created on demand, with the drawer and container options loaded from the API
+async function showPartOut(setNumber) {
+    const modal = document.getElementById('partout_modal');
+    modal.innerHTML = `<h3>Part out ${escapeHtml(setNumber)}</h3>` +
+        '<select id="inventory_drawerPartout"><option value="">Select a drawer</option></select>' +
+        '<select id="inventory_containerPartout"><option value="">Select a container</option></select>' +
+        '<button id="inventoryModalActionPartout">Part Out</button><div id="partout_result"></div>';
+
+    const drawerSelect = document.getElementById('inventory_drawerPartout');
+    const containerSelect = document.getElementById('inventory_containerPartout');
+
+    drawerSelect.addEventListener('change', async () => {
+        containerSelect.innerHTML = '<option value="">Select a container</option>';
+        if (!drawerSelect.value) {
+            return;
+        }
+        const containers = await api('/api/drawers/' + encodeURIComponent(drawerSelect.value) + '/containers');
+        for (const container of containers) {
+            containerSelect.add(new Option(container, container));
+        }
+    });
+
+    document.getElementById('inventoryModalActionPartout').addEventListener('click', async () => {
+        const result = await api('/api/partout', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({set: setNumber, drawer: drawerSelect.value, container: containerSelect.value})
+        });
+        document.getElementById('partout_result').innerHTML = result.ok
+            ? '<div class="alert alert-success">Set parted out successfully.</div>'
+            : `<div class="alert alert-danger">${escapeHtml(result.error)}</div>`;
+    });
+
+    const drawers = await api('/api/drawers');
+    for (const drawer of drawers) {
+        drawerSelect.add(new Option(drawer, drawer));
+    }
+}
+
+filterInput.addEventListener('keydown', (event) => {
+    if (event.key === 'Enter') {
+        searchSets(filterInput.value);
+    }
+});
+
+tbody.addEventListener('click', (event) => {
+    const button = event.target.closest('button');
+    if (!button) {
+        return;
+    }
+    if (button.classList.contains('table_button_show_set')) {
+        window.location = '/sets/' + encodeURIComponent(button.dataset.set);
+    } else if (button.classList.contains('table_button_partout_inventory')) {
+        showPartOut(button.dataset.set);
+    }
+});
+
+searchSets('');
+"""
+
+SET_INFO_BODY = """
+<h2>{set_number}</h2>
+<div id="set_parts_list_length"><label>Show <select>
+    <option value="10">10</option><option value="25" selected>25</option><option value="50">50</option><option value="100">100</option>
+</select> entries</label></div>
+<table id="set_parts_list">
+    <thead><tr><th>Part</th><th>Name</th><th>Design</th><th>Color</th><th>Type</th><th>Category</th><th>Qty</th></tr></thead>
+    <tbody></tbody>
+</table>
+<div id="set_parts_list_paginate"><a id="set_parts_list_next" class="paginate_button next">Next</a></div>
+"""
+
+SET_INFO_SCRIPT = """
+const setNumber = {set_number_json};
+const lengthSelect = document.querySelector('#set_parts_list_length select');
+const tbody = document.querySelector('#set_parts_list tbody');
+const nextButton = document.getElementById('set_parts_list_next');
+let start = 0;
+let latestPage = 0;
+
+function renderPartRow(part) {{
+    return '<tr>' + [part.part_id, part.name, part.design_id, part.color, part.type, part.category, part.qty]
+        .map((value) => `<td>${{escapeHtml(value)}}</td>`).join('') + '</tr>';
+}}
+
+// Load a page of parts; the info element only appears once the first page has loaded
+async function loadPage() {{
+    const pageId = ++latestPage;
+    const length = parseInt(lengthSelect.value, 10);
+    const data = await api(`/api/sets/${{encodeURIComponent(setNumber)}}/parts?start=${{start}}&length=${{length}}`);
+    if (pageId !== latestPage) {{
+        return;
+    }}
+    tbody.innerHTML = data.rows.map(renderPartRow).join('');
+
+    let info = document.querySelector('.dataTables_info');
+    if (!info) {{
+        info = document.createElement('div');
+        info.className = 'dataTables_info';
+        info.id = 'set_parts_list_info';
+        document.getElementById('set_parts_list').after(info);
+    }}
+    const end = Math.min(start + length, data.total);
+    info.textContent = data.total ? `Showing ${{start + 1}} to ${{end}} of ${{data.total}} entries` : 'Showing 0 to 0 of 0 entries';
+    nextButton.className = 'paginate_button next' + (end >= data.total ? ' disabled' : '');
+}}
+
+lengthSelect.addEventListener('change', () => {{
+    start = 0;
+    loadPage();
+}});
+
+nextButton.addEventListener('click', () => {{
+    if (nextButton.classList.contains('disabled')) {{
+        return;
+    }}
+    start += parseInt(lengthSelect.value, 10);
+    loadPage();
+}});
+
+loadPage();
+"""
+
+INVENTORY_BODY = """
+<div class="btn-group">
+    <label class="btn">Parts <input type="radio" name="inventory_view" id="parts" checked></label>
+    <label class="btn">Drawers <input type="radio" name="inventory_view" id="drawers"></label>
+</div>
+<div id="inventory_view"></div>
+"""
+
+INVENTORY_SCRIPT = """
+const view = document.getElementById('inventory_view');
+
+async function showDrawers() {
+    const drawers = await api('/api/drawers');
+    view.innerHTML = '<button id="add_drawer">Add drawer</button><div id="inventory_list">' +
+        drawers.map((drawer) =>
+            '<div class="card">' +
+            `<div class="card-header">${escapeHtml(drawer)}</div>` +
+            '<div class="card-body"></div>' +
+            `<div class="card-footer"><a class="card_button_containers" href="#" data-drawer="${escapeHtml(drawer)}">Manage content</a></div>` +
+            '</div>'
+        ).join('') + '</div>';
+}
+
+async function showContainers(drawer) {
+    const containers = await api('/api/drawers/' + encodeURIComponent(drawer) + '/containers');
+    view.innerHTML = `<h3>${escapeHtml(drawer)}</h3><button id="add_container">Create container</button>` +
+        '<div id="add_container_form"></div><ul id="container_list">' +
+        containers.map((container) => `<li>${escapeHtml(container)}</li>`).join('') + '</ul>';
+
+    document.getElementById('add_container').addEventListener('click', () => {
+        document.getElementById('add_container_form').innerHTML =
+            '<input type="text" class="add_container_name"><button class="save_add_container">Save</button>';
+
+        document.querySelector('button.save_add_container').addEventListener('click', async () => {
+            const name = document.querySelector('input.add_container_name').value;
+            await api('/api/drawers/' + encodeURIComponent(drawer) + '/containers', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({name: name})
+            });
+            showContainers(drawer);
+        });
+    });
+}
+
+document.getElementById('drawers').addEventListener('change', showDrawers);
+
+view.addEventListener('click', (event) => {
+    const link = event.target.closest('a.card_button_containers');
+    if (link) {
+        event.preventDefault();
+        showContainers(link.dataset.drawer);
+    }
+});
+
+// Mark the page as loaded, like the Pace progress bar on the real website
+window.addEventListener('load', () => document.body.classList.add('pace-done'));
+"""
+
+# Deterministic mock dataset: sets and their part lists are generated from the seed, part lists on demand
+
+class MockDataset:
+
+    themes = ["City", "Technic", "Creator", "Star Wars", "Friends", "Ninjago", "Duplo", "Ideas"]
+    part_types = ["Brick", "Plate", "Tile", "Slope", "Technic", "Minifig"]
+
+    def __init__(self, num_sets, parts_per_set, num_drawers, seed):
+        self.parts_per_set = parts_per_set
+        self.seed = seed
+        self.colors = [name for name in load_color_table()[0].values() if name != "N/A"]
+        self.sets = []
+        self.sets_by_number = {}
+
+        rng = random.Random(seed)
+        for index in range(num_sets):
+            set_number = f"mock-{10000 + index}-1"   # Prefixed so mock downloads never collide with real set numbers
+            mock_set = {
+                "number": set_number,
+                "name": f"Mock Set {index + 1}",
+                "year": 2000 + index % 25,
+                "theme": rng.choice(self.themes),
+                "num_parts": None   # Filled in the first time the set is returned by a search
+            }
+            self.sets.append(mock_set)
+            self.sets_by_number[set_number] = mock_set
+
+        self.drawers = {f"Drawer {index + 1}": [] for index in range(num_drawers)}
+        self.parted_out = []
+        self.lock = threading.Lock()
+
+    # Part lists are regenerated from the seed on every request, so large datasets stay small in memory
+
+    def generate_parts(self, set_number):
+        rng = random.Random(f"{self.seed}-{set_number}")
+        parts = []
+        for _ in range(self.parts_per_set):
+            design_id = str(rng.randint(3001, 99999))
+            color = rng.choice(self.colors)
+            part_type = rng.choice(self.part_types)
+            parts.append({
+                "part_id": str(rng.randint(300000, 6999999)),
+                "name": f"{part_type} {design_id}",
+                "design_id": design_id,
+                "color": color,
+                "type": "Part",
+                "category": part_type,
+                "qty": rng.randint(1, 12)
+            })
+        return parts
+
+    def search_sets(self, search, length=25):
+        search = search.strip().lower()
+        matches = (s for s in self.sets if search in s["number"].lower() or search in s["name"].lower())
+        results = [s for s, _ in zip(matches, range(length))]
+
+        for mock_set in results:
+            if mock_set["num_parts"] is None:
+                mock_set["num_parts"] = sum(part["qty"] for part in self.generate_parts(mock_set["number"]))
+
+        return results
+
+# Request handler for the mock website and its JSON API
+
+class MockInstabrickHandler(BaseHTTPRequestHandler):
+
+    dataset = None          # MockDataset shared by every request
+    latency = 0.0           # Seconds added to every request
+    session_lifetime = 0    # Seconds before a session expires (0 = never)
+    verbose = False
+    sessions = {}
+    request_count = 0
+    count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    # Responses
+
+    def send_body(self, status, body, content_type, headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_page(self, title, body, script=""):
+        self.send_body(200, PAGE_TEMPLATE.format(title=html.escape(title), body=body, script=script), "text/html; charset=utf-8")
+
+    def send_json(self, value, status=200):
+        self.send_body(status, json.dumps(value), "application/json")
+
+    def redirect(self, location, headers=None):
+        self.send_body(303, "", "text/plain", {"Location": location, **(headers or {})})
+
+    # Sessions
+
+    def session_valid(self):
+        for cookie in self.headers.get("Cookie", "").split(";"):
+            name, _, token = cookie.strip().partition("=")
+            if name == "ib_session" and token in self.sessions:
+                return not self.session_lifetime or time.monotonic() - self.sessions[token] < self.session_lifetime
+        return False
+
+    # Requests (malformed values raise ValueError, which the routes answer with 400 Bad Request)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length < 0:
+            raise ValueError("negative Content-Length")
+        return self.rfile.read(length).decode("utf-8")
+
+    def read_json_body(self):
+        value = json.loads(self.read_body() or "{}")
+        if not isinstance(value, dict):
+            raise ValueError("the request body must be a JSON object")
+        return value
+
+    def query_int(self, query, name, default, minimum):
+        value = int(query.get(name, default))
+        if value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}")
+        return value
+
+    # Routing
+
+    def handle_request(self, method):
+        with self.count_lock:
+            MockInstabrickHandler.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(self.path)
+        path = [unquote(segment) for segment in url.path.strip("/").split("/")]
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+        if path == ["signin"]:
+            return self.signin(method)
+
+        if not self.session_valid():
+            if path[0] == "api":
+                return self.send_json({"error": "Session expired"}, status=401)
+            return self.redirect("/signin")
+
+        if method == "GET" and path in (["dashboard"], [""]):
+            return self.send_page("Dashboard", "<h2>Dashboard</h2>")
+        if method == "GET" and path == ["sets"]:
+            return self.send_page("Sets", SETS_BODY, SETS_SCRIPT)
+        if method == "GET" and len(path) == 2 and path[0] == "sets" and path[1] in self.dataset.sets_by_number:
+            return self.send_page(
+                path[1],
+                SET_INFO_BODY.format(set_number=html.escape(path[1])),
+                SET_INFO_SCRIPT.format(set_number_json=json.dumps(path[1]))
+            )
+        if method == "GET" and path == ["inventory"]:
+            return self.send_page("Inventory", INVENTORY_BODY, INVENTORY_SCRIPT)
+        if path[0] == "api":
+            return self.api(method, path[1:], query)
+
+        self.send_body(404, "Not found", "text/plain")
+
+    def signin(self, method):
+        if method == "GET":
+            return self.send_body(200, SIGNIN_PAGE, "text/html; charset=utf-8")
+
+        # Any non-empty email and password are accepted
+        try:
+            form = {name: values[0] for name, values in parse_qs(self.read_body()).items()}
+        except ValueError as e:
+            return self.send_body(400, f"Bad request: {e}", "text/plain")
+        if not form.get("email") or not form.get("password"):
+            return self.redirect("/signin")
+
+        token = secrets.token_hex(16)
+        self.sessions[token] = time.monotonic()
+        self.redirect("/dashboard", {"Set-Cookie": f"ib_session={token}; Path=/"})
+
+    def api(self, method, path, query):
+        try:
+            return self.api_route(method, path, query)
+        except ValueError as e:
+            return self.send_json({"error": f"Bad request: {e}"}, status=400)
+
+    def api_route(self, method, path, query):
+        dataset = self.dataset
+
+        if method == "GET" and path == ["sets"]:
+            return self.send_json(dataset.search_sets(query.get("search", "")))
+
+        if method == "GET" and len(path) == 3 and path[0] == "sets" and path[2] == "parts":
+            if path[1] not in dataset.sets_by_number:
+                return self.send_json({"error": "Unknown set"}, status=404)
+            parts = dataset.generate_parts(path[1])
+            start = self.query_int(query, "start", 0, 0)
+            length = self.query_int(query, "length", 25, 1)
+            return self.send_json({"total": len(parts), "rows": parts[start:start + length]})
+
+        if method == "GET" and path == ["drawers"]:
+            return self.send_json(list(dataset.drawers))
+
+        if len(path) == 3 and path[0] == "drawers" and path[2] == "containers":
+            if path[1] not in dataset.drawers:
+                return self.send_json({"error": "Unknown drawer"}, status=404)
+            if method == "POST":
+                name = str(self.read_json_body().get("name", "")).strip()
+                with dataset.lock:
+                    if name and name not in dataset.drawers[path[1]]:
+                        dataset.drawers[path[1]].append(name)
+            return self.send_json(dataset.drawers[path[1]])
+
+        if method == "POST" and path == ["partout"]:
+            request = self.read_json_body()
+            if request.get("container") not in dataset.drawers.get(str(request.get("drawer")), []):
+                return self.send_json({"ok": False, "error": "Choose a drawer and container"})
+            with dataset.lock:
+                dataset.parted_out.append(request)
+            return self.send_json({"ok": True})
+
+        self.send_json({"error": "Not found"}, status=404)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+# Main function
+
+def main(host, port, latency, num_sets, parts_per_set, num_drawers, seed, session_lifetime, verbose):
+
+    start_time = time.monotonic()
+    dataset = MockDataset(num_sets, parts_per_set, num_drawers, seed)
+    print(f"Generated {num_sets} sets with {parts_per_set} parts each in {time.monotonic() - start_time:.1f}s.")
+
+    MockInstabrickHandler.dataset = dataset
+    MockInstabrickHandler.latency = latency
+    MockInstabrickHandler.session_lifetime = session_lifetime
+    MockInstabrickHandler.verbose = verbose
+
+    server = ThreadingHTTPServer((host, port), MockInstabrickHandler)
+    base_url = f"http://{host}:{port}"
+    print(f"Mock Instabrick server running at {base_url} (latency {latency}s per request).")
+    print(f"Point the scripts at it with: export INSTABRICK_BASE_URL={base_url}")
+    print(f"Example set numbers: {', '.join(s['number'] for s in dataset.sets[:3])}")
+
+    start_time = time.monotonic()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    elapsed = time.monotonic() - start_time
+    print(f"\nServed {MockInstabrickHandler.request_count} requests in {elapsed:.1f}s; {len(dataset.parted_out)} sets parted out.")
+
+# Entry point
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Instabrick website, for offline and performance testing.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency added to every request (default: 0)")
+    parser.add_argument("--sets", type=int, default=100, help="number of sets in the mock catalog (default: 100)")
+    parser.add_argument("--parts", type=int, default=150, help="number of part lots in each set's part list (default: 150)")
+    parser.add_argument("--drawers", type=int, default=3, help="number of drawers in the mock inventory (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated catalog (default: 1)")
+    parser.add_argument("--session-lifetime", type=float, default=0, help="seconds before a login session expires, to exercise re-login (default: never)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    if args.sets < 1 or args.parts < 1:
+        parser.error("--sets and --parts must be at least 1")
+
+    main(args.host, args.port, args.latency, args.sets, args.parts, args.drawers, args.seed, args.session_lifetime, args.verbose)
@@ -1,5 +1,10 @@
+import json
 import os 
+import pandas as pd
+import pickle
 import sys
+import xml.etree.ElementTree as ET
+from dotenv import dotenv_values
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
@@ -11,6 +16,27 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+from utils.part_lookups import lookup_color_id
+from utils.part_lookups import normalize_design_id
+from utils.scrape_pipeline import TokenBucket
+
+# Base URL of the Instabrick website (override with INSTABRICK_BASE_URL, e.g. to use the local mock server)
+
+base_url = os.getenv("INSTABRICK_BASE_URL", "https://app.instabrick.org").rstrip("/")
+
+# Default throttle for requests to the Instabrick website (requests per second, burst size)
+
+DEFAULT_RATE_LIMIT = 2.0
+DEFAULT_RATE_BURST = 5
+
+rate_limiter = TokenBucket(DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST)
+
+# Directory holding the user's data (the default profile), and the directory holding named profiles for a shared workshop
+# (override the data directory with INSTABRICK_DATA_DIR, e.g. to keep benchmark output away from real downloads)
+
+user_data_dir = os.path.normpath(os.getenv("INSTABRICK_DATA_DIR") or os.path.join(os.path.dirname(__file__), "../../data/user_data"))
+profiles_dir = os.path.join(user_data_dir, "profiles")
+
 # Function to normalize the set number
 
 def normalize_set_number(set_number):
@@ -22,23 +48,52 @@ def normalize_set_number(set_number):
         print(f"Processing set number '{normalized_set_number}'.")
         return normalized_set_number
     
+# Function to change the throttle for requests to the Instabrick website
+
+def set_rate_limit(requests_per_second, burst=DEFAULT_RATE_BURST):
+    global rate_limiter
+    rate_limiter = TokenBucket(requests_per_second, burst)
+
+# Function to wait for the throttle before each request to the Instabrick website
+
+def throttle():
+    rate_limiter.wait()
+
+# Function to get the data directory for a profile (None for the default, single-user profile)
+
+def get_profile_dir(profile=None):
+
+    if profile is None:
+        return user_data_dir
+
+    profile_dir = os.path.join(profiles_dir, profile)
+    if not os.path.isdir(profile_dir):
+        print(f"Error: The profile '{profile}' was not found at {profile_dir}.")
+        print("Please create the profile directory with the user's inventory.xml and .env files.")
+        sys.exit(1)
+
+    return profile_dir
+
 # Function to load Instabrick credentials from .env file
 
-def load_instabrick_environment():
+def load_instabrick_environment(profile=None):
     
-    dotenv_path = os.path.join(os.path.dirname(__file__), "../../data/user_data/.env")
+    dotenv_path = os.path.join(get_profile_dir(profile), ".env")
 
     if not os.path.exists(dotenv_path):
         print(f"Error: The .env file was not found at {dotenv_path}.")
         print("Please create the .env file with your credentials in the specified directory.")
         sys.exit(1)  # Exit the script with an error code
 
-    load_dotenv(dotenv_path)
-
-    # Retrieve credentials from .env file
-
-    USERNAME = os.getenv("INSTABRICK_USERNAME")
-    PASSWORD = os.getenv("INSTABRICK_PASSWORD")
+    # Retrieve credentials from .env file; a named profile only uses its own file, never the environment
+    if profile is None:
+        load_dotenv(dotenv_path)
+        USERNAME = os.getenv("INSTABRICK_USERNAME")
+        PASSWORD = os.getenv("INSTABRICK_PASSWORD")
+    else:
+        credentials = dotenv_values(dotenv_path)
+        USERNAME = credentials.get("INSTABRICK_USERNAME")
+        PASSWORD = credentials.get("INSTABRICK_PASSWORD")
 
     if not USERNAME or not PASSWORD:
         print("Error: Missing USERNAME or PASSWORD in the .env file.")
@@ -46,6 +101,94 @@ def load_instabrick_environment():
 
     return USERNAME, PASSWORD
 
+# Function to load the strings to ignore from an (optional) configuration file
+
+def load_ignore_strings(config_file):
+    try:
+        with open(config_file, 'r') as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        config = {}
+
+    return config.get('ignore_strings', [])
+
+# Function to parse the inventory XML exported from Instabrick
+
+def parse_inventory(inventory_file, ignore_strings):
+
+    tree = ET.parse(inventory_file)
+    root = tree.getroot()
+
+    inventory = []
+
+    # Build the inventory data structure
+    for item in root.findall('ITEM'):
+        design_id = item.find('ITEMID').text
+        color = item.find('COLOR').text
+        quantity = int(item.find('QTY').text)
+        location = item.find('REMARKS').text
+
+        # Ignore locations matching the strings to ignore
+        if any(ignore in location for ignore in ignore_strings):
+            continue
+
+        # Remove the [IB] text from the location for readability
+        if location.startswith('[IB]') and location.endswith('[IB]'):
+            location = location[4:-4].strip()
+
+        inventory.append({
+            'design_id': design_id,
+            'color': color,
+            'quantity': quantity,
+            'location': location
+        })
+
+    return inventory
+
+# Function to load a profile's inventory, reusing the profile's cached copy while inventory.xml is unchanged
+
+def load_profile_inventory(profile, ignore_strings):
+
+    profile_dir = get_profile_dir(profile)
+    inventory_file = os.path.join(profile_dir, "inventory.xml")
+    if not os.path.exists(inventory_file):
+        print(f"Error: The inventory file was not found at {inventory_file}.")
+        print("Please export your inventory from the Instabrick website and place it in the specified directory.")
+        sys.exit(1)
+
+    # The cache is only valid for the same inventory file and the same strings to ignore
+    stat = os.stat(inventory_file)
+    cache_key = (stat.st_mtime_ns, stat.st_size, tuple(ignore_strings))
+    cache_file = os.path.join(profile_dir, "cache", "inventory.pkl")
+
+    try:
+        with open(cache_file, "rb") as file:
+            cached = pickle.load(file)
+        if cached["key"] == cache_key:
+            return cached["inventory"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+        pass
+
+    inventory = parse_inventory(inventory_file, ignore_strings)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file, "wb") as file:
+        pickle.dump({"key": cache_key, "inventory": inventory}, file)
+
+    return inventory
+
+# Function to total the quantity on hand per (design, color) key, written as "<normalized design ID>|<color code>"
+
+def build_inventory_vector(inventory):
+
+    if not inventory:
+        return pd.Series(dtype='int64')
+
+    df_inventory = pd.DataFrame(inventory)
+    keys = df_inventory['design_id'].map(normalize_design_id) + '|' + df_inventory['color'].map(lookup_color_id).fillna(df_inventory['color'].astype(str))
+
+    return df_inventory['quantity'].groupby(keys).sum()
+
 # Function to initialize WebDriver (headless Chrome)
 
 def init_webdriver():
@@ -65,27 +208,36 @@ def init_webdriver():
 
     return driver
 
-# Function to log into Instabrick
+# Function to sign into Instabrick (raises TimeoutException if the login does not complete)
 
-def login_instabrick(driver, USERNAME, PASSWORD):
+def sign_in_instabrick(driver, USERNAME, PASSWORD):
 
-    login_url = "https://app.instabrick.org/signin"
-    try:
-        # Navigate to the login page
-        driver.get(login_url)
+    login_url = f"{base_url}/signin"
+
+    # Navigate to the login page
+    throttle()
+    driver.get(login_url)
+
+    # Log into the website
+    wait = WebDriverWait(driver, 10)
+    username_input = wait.until(EC.presence_of_element_located((By.ID, "loginemail")))
+    password_input = driver.find_element(By.ID, "loginpassword")
+    login_button = driver.find_element(By.ID, "sign_in")
+
+    username_input.send_keys(USERNAME)
+    password_input.send_keys(PASSWORD)
+    throttle()
+    login_button.click()
 
-        # Log into the website
-        wait = WebDriverWait(driver, 10)
-        username_input = wait.until(EC.presence_of_element_located((By.ID, "loginemail")))
-        password_input = driver.find_element(By.ID, "loginpassword")
-        login_button = driver.find_element(By.ID, "sign_in")
+    # Wait for a successful login indicator (the top menu element)
+    wait.until(EC.presence_of_element_located((By.ID, "top-menu")))
 
-        username_input.send_keys(USERNAME)
-        password_input.send_keys(PASSWORD)
-        login_button.click()
+# Function to log into Instabrick at the start of a run
 
-        # Wait for a successful login indicator (the top menu element)
-        wait.until(EC.presence_of_element_located((By.ID, "top-menu")))
+def login_instabrick(driver, USERNAME, PASSWORD):
+
+    try:
+        sign_in_instabrick(driver, USERNAME, PASSWORD)
 
     except TimeoutException:
         # If the dashboard doesn't load, assume login failed
@@ -96,7 +248,8 @@ def login_instabrick(driver, USERNAME, PASSWORD):
 
 def navigate_to_sets_page(driver):
 
-    sets_url = "https://app.instabrick.org/sets"
+    sets_url = f"{base_url}/sets"
+    throttle()
     driver.get(sets_url)
 
     # Wait for the Sets table to load
@@ -114,6 +267,7 @@ def search_for_set(driver, set_number):
     # Clear the Search field; enter the set number; and simulate hitting the Enter key
     filter_input.clear()
     filter_input.send_keys(set_number)
+    throttle()
     filter_input.send_keys(Keys.RETURN)
 
     # Wait for the "Processing..." message to disappear
@@ -143,7 +297,8 @@ def search_for_set(driver, set_number):
 
 def navigate_to_inventory_page(driver):
     
-    inventory_url = "https://app.instabrick.org/inventory"
+    inventory_url = f"{base_url}/inventory"
+    throttle()
     driver.get(inventory_url)
 
     # Wait for the Inventory page to load
@@ -0,0 +1,212 @@
+import csv
+import json
+import os
+import pandas as pd
+import sys
+from xml.sax.saxutils import escape
+
+# Output formats and the file extension used for each
+
+FILE_EXTENSIONS = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "parquet": ".parquet",
+    "xlsx": ".xlsx",
+    "bricklink": ".xml"
+}
+
+TABULAR_FORMATS = ["csv", "jsonl", "parquet", "xlsx"]
+
+# Integer columns in typed formats (Parquet); every other column is written as a string
+
+INTEGER_FIELDS = {"Quantity", "Quantity Needed", "Color ID"}
+
+# Optional dependencies of the output formats (module to import, package to install)
+
+OPTIONAL_PACKAGES = {
+    "parquet": ("pyarrow.parquet", "pyarrow"),
+    "xlsx": ("openpyxl", "openpyxl")
+}
+
+# Function to import an optional dependency, exiting with install instructions if it is missing
+
+def import_optional(module_name, package_name, output_format):
+    try:
+        return __import__(module_name, fromlist=["_"])
+    except ImportError:
+        print(f"Error: The {output_format} format requires the '{package_name}' package.")
+        print(f"Install it with: python3 -m pip install {package_name}")
+        sys.exit(1)
+
+# Function to check up front that an output format's optional dependency is installed (exits if it is missing)
+
+def check_output_format(output_format):
+    if output_format in OPTIONAL_PACKAGES:
+        import_optional(*OPTIONAL_PACKAGES[output_format], output_format)
+
+# Streaming writers: each writes rows (dicts) to its file as they arrive, instead of building the whole output in memory
+
+class CsvWriter:
+
+    def __init__(self, path, fieldnames):
+        self.file = open(path, mode="w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+class JsonlWriter:
+
+    def __init__(self, path, fieldnames):
+        self.file = open(path, mode="w", encoding="utf-8")
+        self.fieldnames = fieldnames
+
+    def write_row(self, row):
+        record = {field: row.get(field) for field in self.fieldnames}
+        self.file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+
+    # Rows are buffered and written one row group at a time
+    batch_size = 10000
+
+    def __init__(self, path, fieldnames):
+        self.pa = import_optional("pyarrow", "pyarrow", "parquet")
+        self.pq = import_optional("pyarrow.parquet", "pyarrow", "parquet")
+        self.fieldnames = fieldnames
+        self.rows = []
+
+        # The schema comes from the field names, so it doesn't depend on the values in the first batch
+        self.schema = self.pa.schema([
+            (field, self.pa.int64() if field in INTEGER_FIELDS else self.pa.string()) for field in fieldnames
+        ])
+        self.writer = self.pq.ParquetWriter(path, self.schema)
+
+    # Function to convert a value to the column type (None for missing values)
+
+    def convert(self, field, value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        return int(value) if field in INTEGER_FIELDS else str(value)
+
+    def write_row(self, row):
+        self.rows.append({field: self.convert(field, row.get(field)) for field in self.fieldnames})
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        if self.rows:
+            self.flush()
+        self.writer.close()
+
+class XlsxWriter:
+
+    def __init__(self, path, fieldnames):
+        openpyxl = import_optional("openpyxl", "openpyxl", "xlsx")
+
+        # A write-only workbook streams rows to disk instead of keeping every cell in memory
+        self.path = path
+        self.fieldnames = fieldnames
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(fieldnames)
+
+    def write_row(self, row):
+        self.sheet.append([row.get(field) for field in self.fieldnames])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+class BrickLinkXmlWriter:
+
+    # Row fields used for the BrickLink wanted list item number, color code and quantity
+    item_field = "Design ID"
+    color_field = "Color ID"
+    quantity_field = "Quantity"
+
+    def __init__(self, path, fieldnames):
+        self.file = open(path, mode="w", encoding="utf-8")
+        self.file.write("<INVENTORY>\n")
+
+    def write_row(self, row):
+        color = row.get(self.color_field)
+        self.file.write("  <ITEM>\n")
+        self.file.write("    <ITEMTYPE>P</ITEMTYPE>\n")
+        self.file.write(f"    <ITEMID>{escape(str(row[self.item_field]))}</ITEMID>\n")
+        if color is not None and not pd.isna(color):
+            self.file.write(f"    <COLOR>{escape(str(color))}</COLOR>\n")
+        self.file.write(f"    <MINQTY>{int(row[self.quantity_field])}</MINQTY>\n")
+        self.file.write("  </ITEM>\n")
+
+    def close(self):
+        self.file.write("</INVENTORY>\n")
+        self.file.close()
+
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+    "xlsx": XlsxWriter,
+    "bricklink": BrickLinkXmlWriter
+}
+
+# Function to build an output file path from a path without extension and the output format
+
+def output_path(path_without_extension, output_format):
+    return path_without_extension + FILE_EXTENSIONS[output_format]
+
+# Function to stream rows to a file in the chosen format, returning the number of rows written
+
+def write_rows(rows, path, fieldnames, output_format):
+
+    writer = WRITERS[output_format](path, fieldnames)
+    count = 0
+    try:
+        for row in rows:
+            writer.write_row(row)
+            count += 1
+    finally:
+        writer.close()
+
+    return count
+
+# Function to find an existing file written in any tabular format (the most recently written one if there are several)
+
+def find_output_file(path_without_extension):
+
+    paths = [output_path(path_without_extension, output_format) for output_format in TABULAR_FORMATS]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+
+    newest_path = max(paths, key=os.path.getmtime)
+    if len(paths) > 1:
+        print(f"Note: Found {len(paths)} formats of {os.path.basename(path_without_extension)}; using the newest, {os.path.basename(newest_path)}.")
+
+    return newest_path
+
+# Function to read a file written in any tabular format into a DataFrame
+
+def read_output_file(path, **kwargs):
+
+    extension = os.path.splitext(path)[1]
+    if extension == ".jsonl":
+        return pd.read_json(path, lines=True, dtype=kwargs.get("dtype"))
+    if extension == ".parquet":
+        import_optional("pyarrow", "pyarrow", "parquet")
+        return pd.read_parquet(path, columns=kwargs.get("usecols"))
+    if extension == ".xlsx":
+        import_optional("openpyxl", "openpyxl", "xlsx")
+        return pd.read_excel(path, **kwargs)
+    return pd.read_csv(path, **kwargs)
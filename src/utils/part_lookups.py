@@ -0,0 +1,95 @@
+import csv
+import os
+import re
+from functools import lru_cache
+
+# File path for the Instabrick color table (color code, color name)
+
+color_mapping_file = os.path.normpath(os.path.join(os.path.dirname(__file__), "../../data/instabrick_colors.csv"))
+
+# Alternative names for colors in the color table (LEGO names and common spellings -> Instabrick name)
+
+COLOR_ALIASES = {
+    "bright red": "red",
+    "bright blue": "blue",
+    "bright yellow": "yellow",
+    "brick yellow": "tan",
+    "old light gray": "light gray",
+    "old dark gray": "dark gray",
+    "medium stone gray": "light bluish gray",
+    "dark stone gray": "dark bluish gray",
+    "earth blue": "dark blue",
+    "bright orange": "orange",
+    "sand yellow": "dark tan",
+    "bright yellowish green": "lime",
+    "medium lilac": "dark purple",
+    "bright reddish violet": "magenta",
+    "transparent": "trans-clear",
+    "silver metallic": "flat silver",
+    "warm gold": "pearl gold"
+}
+
+# Function to normalize a color name for lookups (case, spacing, "grey" and "transparent" spellings)
+
+def normalize_color_name(name):
+    name = re.sub(r"\s+", " ", str(name).strip().lower())
+    name = name.replace("grey", "gray")
+    name = re.sub(r"^(transparent|trans)[ -]", "trans-", name)
+    return name
+
+# Function to load the color table once per process: (code -> name, normalized name -> code)
+
+@lru_cache(maxsize=None)
+def load_color_table():
+
+    names_by_id = {}
+    ids_by_name = {}
+
+    with open(color_mapping_file, newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            names_by_id[row["color"]] = row["name"]
+            ids_by_name[normalize_color_name(row["name"])] = row["color"]
+
+    # Aliases only fill in names that are not already in the color table
+    for alias, name in COLOR_ALIASES.items():
+        normalized_name = normalize_color_name(name)
+        if normalized_name in ids_by_name:
+            ids_by_name.setdefault(normalize_color_name(alias), ids_by_name[normalized_name])
+
+    return names_by_id, ids_by_name
+
+# Function to look up the Instabrick color code for a color code, name or alias (None if unknown)
+
+@lru_cache(maxsize=4096)
+def lookup_color_id(color):
+
+    if color is None:
+        return None
+
+    names_by_id, ids_by_name = load_color_table()
+    color = str(color).strip()
+
+    # Numeric codes (possibly read back as floats, e.g. "5.0") are looked up directly
+    code = re.sub(r"\.0+$", "", color)
+    if code in names_by_id:
+        return code
+
+    return ids_by_name.get(normalize_color_name(color))
+
+# Function to look up the Instabrick color name for a color code, name or alias (None if unknown)
+
+@lru_cache(maxsize=4096)
+def lookup_color_name(color):
+    color_id = lookup_color_id(color)
+    if color_id is None:
+        return None
+    return load_color_table()[0][color_id]
+
+# Function to normalize a design ID, so IDs from part lists and the inventory compare equal
+
+@lru_cache(maxsize=65536)
+def normalize_design_id(design_id):
+    design_id = str(design_id).strip().lower()
+
+    # Numeric IDs read back as floats by pandas (e.g. "3001.0")
+    return re.sub(r"^(\d+)\.0+$", r"\1", design_id)
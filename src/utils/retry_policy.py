@@ -0,0 +1,86 @@
+import random
+import time
+from selenium.common.exceptions import ElementClickInterceptedException
+from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+
+from utils.common_functions import sign_in_instabrick
+
+# Error classes used to decide how to recover from a failed step
+
+STALE_ELEMENT = "stale element"
+TIMEOUT = "timeout"
+LOGIN_EXPIRED = "login expired"
+FATAL = "fatal"
+
+# Retry policy: number of attempts and exponential backoff bounds (in seconds)
+
+class RetryPolicy:
+
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=30.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    # Delay before the given retry (1 = first retry), with jitter so parallel runs don't retry in lockstep
+
+    def backoff(self, retry_number):
+        delay = min(self.max_delay, self.base_delay * 2 ** (retry_number - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# Function to check whether the Instabrick session has expired (the website sends us back to the sign-in page)
+
+def login_expired(driver):
+    try:
+        return "/signin" in driver.current_url or bool(driver.find_elements(By.ID, "loginemail"))
+    except Exception:
+        return False
+
+# Function to classify an error raised by a Selenium step
+
+def classify_error(driver, error):
+    if login_expired(driver):
+        return LOGIN_EXPIRED
+    if isinstance(error, StaleElementReferenceException):
+        return STALE_ELEMENT
+    if isinstance(error, (TimeoutException, NoSuchElementException, ElementClickInterceptedException, ElementNotInteractableException)):
+        return TIMEOUT
+    return FATAL
+
+# Function to run a Selenium step, retrying transient failures with exponential backoff
+#
+# The step must be safe to repeat from the start (re-navigating and re-locating its elements),
+# since stale elements and expired sessions can only be recovered by starting the step over.
+# Logging back in after an expired session is part of the next attempt, so a failed re-login
+# counts as a failed attempt instead of ending the run.
+
+def with_retry(driver, step, description, credentials=None, policy=DEFAULT_RETRY_POLICY):
+
+    relogin = False
+
+    for attempt in range(1, policy.attempts + 1):
+        try:
+            # Log back in before retrying if the session has expired
+            if relogin:
+                relogin = False
+                print("Instabrick session expired; logging in again.")
+                sign_in_instabrick(driver, *credentials)
+
+            return step()
+
+        except Exception as e:
+            error_class = classify_error(driver, e)
+            if error_class == FATAL or attempt == policy.attempts:
+                print(f"Failed to {description} ({error_class}, attempt {attempt} of {policy.attempts}): {e}")
+                raise
+
+            delay = policy.backoff(attempt)
+            print(f"Failed to {description} ({error_class}); retrying in {delay:.1f}s (attempt {attempt} of {policy.attempts}).")
+            time.sleep(delay)
+
+            relogin = error_class == LOGIN_EXPIRED and bool(credentials)
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+# Token bucket rate limiter, shared by every thread that talks to the Instabrick website
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"Rate must be greater than 0 and capacity at least 1 (got rate {rate}, capacity {capacity})")
+        self.rate = rate            # Tokens added per second
+        self.capacity = capacity    # Maximum burst size
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available, then take it
+
+    def wait(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+
+# Queue depth and throughput metrics for a pipeline run
+
+class PipelineMetrics:
+
+    def __init__(self, stage_names):
+        self.start_time = time.monotonic()
+        self.counts = {name: 0 for name in stage_names}
+        self.failed = 0
+        self.failed_items = []
+        self.depth_samples = {}
+
+    def record_failure(self, item):
+        self.failed += 1
+        if item is not None and item not in self.failed_items:
+            self.failed_items.append(item)
+
+    def count(self, stage):
+        self.counts[stage] += 1
+
+    def sample_depth(self, queue_name, queue):
+        self.depth_samples.setdefault(queue_name, []).append(queue.qsize())
+
+    def report(self):
+        elapsed = time.monotonic() - self.start_time
+        print(f"Pipeline finished in {elapsed:.1f}s ({self.failed} failed)")
+
+        for stage, count in self.counts.items():
+            throughput = count / elapsed if elapsed > 0 else 0.0
+            print(f"  {stage}: {count} items, {throughput:.2f} items/s")
+
+        for queue_name, samples in self.depth_samples.items():
+            average = sum(samples) / len(samples)
+            print(f"  {queue_name} queue depth: avg {average:.1f}, max {max(samples)}")
+
+# Function to run a fetch -> parse -> write pipeline connected by bounded queues
+#
+# - fetch(item, emit) runs in a worker thread (Selenium is blocking) and calls emit() once per fetched page;
+#   emit() blocks while the parse queue is full, so the browser never runs ahead of the parsers
+# - parse(page) runs in parse_workers threads, so fetched pages are parsed while the next page loads
+# - write(parsed) runs in a single writer, in the order parsed results arrive
+# - item_of(page) returns the item a fetched page or parsed result belongs to, so parse and write
+#   failures are recorded against that item in metrics.failed_items
+# - is_marker(page) tells apart pages and parsed results that only carry a signal (e.g. the end of an item)
+#   from real ones; markers pass through every stage but are not counted in the throughput metrics
+
+async def run_pipeline(items, fetch, parse, write, queue_size=4, parse_workers=2, item_of=None, is_marker=None):
+
+    loop = asyncio.get_running_loop()
+    parse_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    metrics = PipelineMetrics(["fetch", "parse", "write"])
+
+    def count(stage, page):
+        if not (is_marker and is_marker(page)):
+            metrics.count(stage)
+
+    def emit(page):
+        asyncio.run_coroutine_threadsafe(parse_queue.put(page), loop).result()
+        count("fetch", page)
+        metrics.sample_depth("parse", parse_queue)
+
+    async def fetch_stage():
+        for item in items:
+            try:
+                await asyncio.to_thread(fetch, item, emit)
+            except Exception as e:
+                metrics.record_failure(item)
+                print(f"Failed to fetch {item}: {e}")
+
+        # Signal each parse worker that there is nothing left to parse
+        for _ in range(parse_workers):
+            await parse_queue.put(None)
+
+    async def parse_stage():
+        while (page := await parse_queue.get()) is not None:
+            try:
+                parsed = await asyncio.to_thread(parse, page)
+                await write_queue.put(parsed)
+                count("parse", parsed)
+            except Exception as e:
+                item = item_of(page) if item_of else None
+                metrics.record_failure(item)
+                print(f"Failed to parse page{f' of {item}' if item is not None else ''}: {e}")
+            metrics.sample_depth("write", write_queue)
+
+    async def write_stage():
+        while (parsed := await write_queue.get()) is not None:
+            try:
+                await asyncio.to_thread(write, parsed)
+                count("write", parsed)
+            except Exception as e:
+                item = item_of(parsed) if item_of else None
+                metrics.record_failure(item)
+                print(f"Failed to write results{f' for {item}' if item is not None else ''}: {e}")
+
+    writer = asyncio.create_task(write_stage())
+    await asyncio.gather(fetch_stage(), *(parse_stage() for _ in range(parse_workers)))
+    await write_queue.put(None)
+    await writer
+
+    return metrics